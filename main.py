@@ -3,23 +3,34 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
 from prometheus_fastapi_instrumentator import Instrumentator
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 
 from .controllers import math_controller, health_controller
 from .middleware import RateLimitMiddleware, AuthMiddleware
 from .config import settings
 from .database import init_db, close_db
+from .repositories.computation_repository import init_log_flusher, close_log_flusher
 from .cache import init_cache, close_cache
 from .messaging import init_nats, close_nats
+from .services.math_service import drain_background_tasks
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    await init_log_flusher()
     await init_cache()
     await init_nats()
     yield
     # Shutdown
+    await drain_background_tasks()
+    await close_log_flusher()
     await close_db()
     await close_cache()
     await close_nats()
@@ -41,9 +52,29 @@ app.add_middleware(RateLimitMiddleware, requests_per_minute=100)
 app.add_middleware(AuthMiddleware)
 
 # Instrumentation
+# Sampled, batched OTLP export; only set up when an endpoint is configured and no SDK
+# provider was installed already (e.g. by opentelemetry-instrument)
+otlp_endpoint = getattr(settings, "OTEL_EXPORTER_OTLP_ENDPOINT", None)
+if otlp_endpoint and not isinstance(trace.get_tracer_provider(), TracerProvider):
+    tracer_provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: getattr(settings, "OTEL_SERVICE_NAME", "math-service")}),
+        sampler=ParentBased(TraceIdRatioBased(getattr(settings, "OTEL_TRACES_SAMPLE_RATIO", 0.01)))
+    )
+    tracer_provider.add_span_processor(BatchSpanProcessor(
+        OTLPSpanExporter(endpoint=otlp_endpoint),
+        max_queue_size=8192,
+        max_export_batch_size=1024,
+        schedule_delay_millis=5000
+    ))
+    trace.set_tracer_provider(tracer_provider)
+
 Instrumentator().instrument(app).expose(app)
 FastAPIInstrumentor.instrument_app(app)
 
 # Routers
 app.include_router(math_controller.router, prefix="/compute", tags=["mathematics"])
-app.include_router(health_controller.router, prefix="/health", tags=["system"])
\ No newline at end of file
+app.include_router(health_controller.router, prefix="/health", tags=["system"])
+
+if __name__ == "__main__":
+    # uvloop event loop + httptools parser instead of the pure-Python defaults
+    uvicorn.run("app.main:app", loop="uvloop", http="httptools")
\ No newline at end of file
@@ -1,38 +1,147 @@
 from typing import Optional, Union
 from decimal import Decimal
-import hashlib
-import json
+import asyncio
+import logging
+import math
+import os
+import struct
 import time
-from uuid import uuid4
+from uuid import UUID
+
+import gmpy2
+import orjson
+from cachetools import TLRUCache
+import xxhash
+from gmpy2 import mpz
 
 from ..repositories.computation_repository import ComputationRepository
 from ..cache import cache_client
 from ..messaging import publish_event
 from ..models.domain import ComputationRequest, ComputationResult
 from opentelemetry import trace
+from prometheus_client import Counter
 
 tracer = trace.get_tracer(__name__)
+logger = logging.getLogger(__name__)
+
+# A result is "cached" whenever it was not computed for this request: Redis, local-cache
+# and precomputed-table hits all count here. Redis and local-cache hits are not written
+# to the DB or NATS; table lookups still are
+cache_hits_total = Counter("math_cache_hits", "Computation results served from cache", ["operation"])
+
+# Span attribute keys
+ATTR_OPERATION = "math.operation"
+ATTR_BASE = "math.base"
+ATTR_EXPONENT = "math.exponent"
+ATTR_N = "math.n"
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks = set()
+
+def _on_background_task_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed", exc_info=task.exception())
+
+async def drain_background_tasks():
+    """Wait for pending fire-and-forget logs and publishes; call before closing their sinks"""
+    # Tasks may schedule further tasks (a log schedules its publish), so loop until empty
+    while _background_tasks:
+        await asyncio.gather(*list(_background_tasks), return_exceptions=True)
+
+# Process-local cache in front of Redis. MathService is built per request, so this
+# lives at module level; single event loop per worker means no lock is needed.
+# Entries are (payload, ttl) and the cache is bounded by total payload bytes.
+LOCAL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+LOCAL_CACHE_MAX_ITEM_BYTES = 1024 * 1024
+LOCAL_CACHE_TTL = 300  # seconds, upper bound on any caller's cache_ttl
+
+def _local_cache_ttu(key, value, now):
+    return now + value[1]
+
+_local_cache = TLRUCache(
+    maxsize=LOCAL_CACHE_MAX_BYTES,
+    ttu=_local_cache_ttu,
+    getsizeof=lambda value: len(value[0])
+)
+
+# Random bytes for request ids are drawn from a pooled os.urandom buffer
+_RANDOM_POOL_SIZE = 4096
+_random_pool = b""
+_random_offset = 0
+_last_ms = 0
+_last_seq = 0
+
+def _uuid7() -> str:
+    """Time-ordered UUIDv7 (RFC 9562) with a 12-bit per-millisecond counter"""
+    global _random_pool, _random_offset, _last_ms, _last_seq
+    if _random_offset + 10 > len(_random_pool):
+        _random_pool = os.urandom(_RANDOM_POOL_SIZE)
+        _random_offset = 0
+    rand = int.from_bytes(_random_pool[_random_offset:_random_offset + 10], "big")
+    _random_offset += 10
+    
+    ms = time.time_ns() // 1_000_000
+    if ms <= _last_ms:
+        # Same (or earlier) millisecond: keep ids monotonic by bumping the counter
+        ms = _last_ms
+        seq = _last_seq + 1
+        if seq > 0xFFF:
+            ms += 1
+            seq = 0
+    else:
+        seq = rand >> 69  # random 11-bit seed leaves headroom for the counter
+    _last_ms, _last_seq = ms, seq
+    
+    value = (ms << 80) | (0x7 << 76) | (seq << 64) | (0b10 << 62) | (rand & ((1 << 62) - 1))
+    return str(UUID(int=value))
+
+# Results for small inputs are precomputed at import and served without touching the cache
+LOOKUP_TABLE_MAX_N = 1000
+
+def _build_lookup_tables(max_n: int):
+    """Fibonacci and factorial values for 0..max_n, as result strings"""
+    fib = [0, 1]
+    fact = [1]
+    for i in range(1, max_n + 1):
+        if i >= 2:
+            fib.append(fib[-1] + fib[-2])
+        fact.append(fact[-1] * i)
+    return tuple(map(str, fib)), tuple(map(str, fact))
+
+_FIB_TABLE, _FACT_TABLE = _build_lookup_tables(LOOKUP_TABLE_MAX_N)
+
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+
+def _pack_key_value(value: Union[int, float]) -> bytes:
+    """Type-tagged canonical bytes for one cache-key argument"""
+    if isinstance(value, float):
+        return b'd' + struct.pack('<d', value)
+    if _INT64_MIN <= value <= _INT64_MAX:
+        return b'q' + struct.pack('<q', value)
+    # Arbitrary-size ints: length-prefixed decimal digits
+    digits = str(value).encode()
+    return b'i' + struct.pack('<I', len(digits)) + digits
 
 class MathService:
     def __init__(self, repo: ComputationRepository):
         self.repo = repo
     
     async def compute_power(self, base: float, exponent: int, cache_ttl: int = 3600) -> ComputationResult:
-        with tracer.start_as_current_span("compute_power") as span:
-            span.set_attribute("math.operation", "power")
-            span.set_attribute("math.base", base)
-            span.set_attribute("math.exponent", exponent)
-            
+        with tracer.start_as_current_span(
+            "compute_power",
+            attributes={ATTR_OPERATION: "power", ATTR_BASE: base, ATTR_EXPONENT: exponent}
+        ):
             # Generate cache key
-            cache_key = self._generate_cache_key("power", base=base, exponent=exponent)
+            cache_key = self._generate_cache_key("power", base, exponent)
             
             # Check cache
-            cached_result = await cache_client.get(cache_key)
+            cached_result = await self._get_cached(cache_key, cache_ttl)
             if cached_result:
-                result = json.loads(cached_result)
+                result = orjson.loads(cached_result)
                 result["cached"] = True
-                await self._log_computation("power", {"base": base, "exponent": exponent}, result["result"], True)
-                return ComputationResult(**result)
+                cache_hits_total.labels(operation="power").inc()
+                return ComputationResult.model_construct(**result)
             
             # Compute
             start_time = time.time()
@@ -40,165 +149,188 @@ class MathService:
             computation_time = (time.time() - start_time) * 1000
             
             # Create result
-            computation_result = ComputationResult(
-                request_id=str(uuid4()),
+            computation_result = ComputationResult.model_construct(
+                request_id=_uuid7(),
                 result=str(result),
                 computation_time_ms=computation_time,
                 cached=False
             )
             
-            # Cache result
-            await cache_client.setex(cache_key, cache_ttl, computation_result.json())
-            
-            # Log to database and message broker
-            await self._log_computation("power", {"base": base, "exponent": exponent}, str(result), False)
+            # Queue the log row, publish the event in the background, then cache
+            params = {"base": base, "exponent": exponent}
+            await self.repo.save_computation("power", params, computation_result.result, False)
+            self._publish_completed("power", params, False)
+            await self._set_cached(cache_key, cache_ttl, computation_result.model_dump_json().encode())
             
             return computation_result
     
     async def compute_fibonacci(self, n: int, cache_ttl: int = 3600) -> ComputationResult:
-        with tracer.start_as_current_span("compute_fibonacci") as span:
-            span.set_attribute("math.operation", "fibonacci")
-            span.set_attribute("math.n", n)
+        with tracer.start_as_current_span(
+            "compute_fibonacci",
+            attributes={ATTR_OPERATION: "fibonacci", ATTR_N: n}
+        ):
+            if 0 <= n <= LOOKUP_TABLE_MAX_N:
+                return await self._lookup_result("fibonacci", n, _FIB_TABLE[n])
             
-            cache_key = self._generate_cache_key("fibonacci", n=n)
+            cache_key = self._generate_cache_key("fibonacci", n)
             
-            cached_result = await cache_client.get(cache_key)
+            cached_result = await self._get_cached(cache_key, cache_ttl)
             if cached_result:
-                result = json.loads(cached_result)
+                result = orjson.loads(cached_result)
                 result["cached"] = True
-                await self._log_computation("fibonacci", {"n": n}, result["result"], True)
-                return ComputationResult(**result)
+                cache_hits_total.labels(operation="fibonacci").inc()
+                return ComputationResult.model_construct(**result)
             
             start_time = time.time()
-            result = self._matrix_fibonacci(n) if n > 1000 else self._iterative_fibonacci(n)
+            result = self._fast_doubling_fib(n)
             computation_time = (time.time() - start_time) * 1000
             
-            computation_result = ComputationResult(
-                request_id=str(uuid4()),
+            computation_result = ComputationResult.model_construct(
+                request_id=_uuid7(),
                 result=str(result),
                 computation_time_ms=computation_time,
                 cached=False
             )
             
-            await cache_client.setex(cache_key, cache_ttl, computation_result.json())
-            await self._log_computation("fibonacci", {"n": n}, str(result), False)
+            await self.repo.save_computation("fibonacci", {"n": n}, computation_result.result, False)
+            self._publish_completed("fibonacci", {"n": n}, False)
+            await self._set_cached(cache_key, cache_ttl, computation_result.model_dump_json().encode())
             
             return computation_result
     
     async def compute_factorial(self, n: int, cache_ttl: int = 3600) -> ComputationResult:
-        with tracer.start_as_current_span("compute_factorial") as span:
-            span.set_attribute("math.operation", "factorial")
-            span.set_attribute("math.n", n)
-            
+        with tracer.start_as_current_span(
+            "compute_factorial",
+            attributes={ATTR_OPERATION: "factorial", ATTR_N: n}
+        ):
             if n > 50000:
                 raise ValueError("Factorial input too large (max: 50000)")
             
-            cache_key = self._generate_cache_key("factorial", n=n)
+            if 0 <= n <= LOOKUP_TABLE_MAX_N:
+                return await self._lookup_result("factorial", n, _FACT_TABLE[n])
             
-            cached_result = await cache_client.get(cache_key)
+            cache_key = self._generate_cache_key("factorial", n)
+            
+            cached_result = await self._get_cached(cache_key, cache_ttl)
             if cached_result:
-                result = json.loads(cached_result)
+                result = orjson.loads(cached_result)
                 result["cached"] = True
-                await self._log_computation("factorial", {"n": n}, result["result"], True)
-                return ComputationResult(**result)
+                cache_hits_total.labels(operation="factorial").inc()
+                return ComputationResult.model_construct(**result)
             
             start_time = time.time()
             result = self._optimized_factorial(n)
             computation_time = (time.time() - start_time) * 1000
             
-            computation_result = ComputationResult(
-                request_id=str(uuid4()),
+            computation_result = ComputationResult.model_construct(
+                request_id=_uuid7(),
                 result=str(result),
                 computation_time_ms=computation_time,
                 cached=False
             )
             
-            await cache_client.setex(cache_key, cache_ttl, computation_result.json())
-            await self._log_computation("factorial", {"n": n}, str(result), False)
+            await self.repo.save_computation("factorial", {"n": n}, computation_result.result, False)
+            self._publish_completed("factorial", {"n": n}, False)
+            await self._set_cached(cache_key, cache_ttl, computation_result.model_dump_json().encode())
             
             return computation_result
     
     def _fast_power(self, base: float, exp: int) -> Union[int, float]:
-        """Fast exponentiation using binary method"""
+        """Fast exponentiation via the C-level builtin pow"""
         if exp == 0:
             return 1
         if exp < 0:
+            if isinstance(base, int):
+                # Divide by a Python int: 1 / mpz would give an mpfr with different formatting
+                return 1 / int(self._fast_power(base, -exp))
             return 1 / self._fast_power(base, -exp)
         
-        result = 1
-        base_power = base
-        while exp > 0:
-            if exp % 2 == 1:
-                result *= base_power
-            base_power *= base_power
-            exp //= 2
-        return result
-    
-    def _iterative_fibonacci(self, n: int) -> int:
-        """Iterative Fibonacci for smaller values"""
-        if n <= 1:
-            return n
-        a, b = 0, 1
-        for _ in range(2, n + 1):
-            a, b = b, a + b
-        return b
+        if isinstance(base, int):
+            return pow(mpz(base), exp)
+        try:
+            return pow(base, exp)
+        except OverflowError:
+            # Raised both when the result overflows and when exp is too big for a float;
+            # keep the results the square-and-multiply loop used to give
+            if math.isnan(base):
+                return base
+            sign = -1.0 if base < 0 and exp % 2 == 1 else 1.0
+            magnitude = abs(base)
+            if magnitude > 1:
+                return sign * math.inf
+            if magnitude < 1:
+                return sign * 0.0
+            return sign
     
-    def _matrix_fibonacci(self, n: int) -> int:
-        """Matrix multiplication method for large Fibonacci numbers"""
-        def matrix_mult(a, b):
-            return [
-                [a[0][0]*b[0][0] + a[0][1]*b[1][0], a[0][0]*b[0][1] + a[0][1]*b[1][1]],
-                [a[1][0]*b[0][0] + a[1][1]*b[1][0], a[1][0]*b[0][1] + a[1][1]*b[1][1]]
-            ]
-        
-        def matrix_power(matrix, n):
-            if n == 1:
-                return matrix
-            if n % 2 == 0:
-                half = matrix_power(matrix, n // 2)
-                return matrix_mult(half, half)
-            return matrix_mult(matrix, matrix_power(matrix, n - 1))
-        
+    def _fast_doubling_fib(self, n: int) -> int:
+        """Fast-doubling Fibonacci, iterating over the bits of n"""
         if n <= 1:
             return n
-        base_matrix = [[1, 1], [1, 0]]
-        result_matrix = matrix_power(base_matrix, n)
-        return result_matrix[0][1]
+        a, b = mpz(0), mpz(1)
+        for bit in bin(n)[2:]:
+            c = a * ((b << 1) - a)
+            d = a * a + b * b
+            if bit == '0':
+                a, b = c, d
+            else:
+                a, b = d, c + d
+        return a
     
     def _optimized_factorial(self, n: int) -> int:
-        """Optimized factorial with divide-and-conquer for large numbers"""
+        """Factorial via GMP's native prime-swing implementation"""
         if n <= 1:
             return 1
-        if n <= 100:
-            result = 1
-            for i in range(2, n + 1):
-                result *= i
-            return result
-        
-        # Divide and conquer for larger factorials
-        mid = n // 2
-        return self._optimized_factorial(mid) * self._product_range(mid + 1, n)
+        return gmpy2.fac(n)
     
-    def _product_range(self, start: int, end: int) -> int:
-        """Helper for factorial divide-and-conquer"""
-        if start > end:
-            return 1
-        if start == end:
-            return start
-        mid = (start + end) // 2
-        return self._product_range(start, mid) * self._product_range(mid + 1, end)
+    def _generate_cache_key(self, operation: str, *values) -> str:
+        """Generate deterministic cache key from the packed operation arguments"""
+        key_data = operation.encode() + b'\x00' + b''.join(map(_pack_key_value, values))
+        return f"math:{operation}:{xxhash.xxh3_128_hexdigest(key_data)}"
+    
+    async def _get_cached(self, cache_key: str, cache_ttl: int) -> Optional[bytes]:
+        """Look up a cached payload, checking the local cache before Redis"""
+        entry = _local_cache.get(cache_key)
+        if entry is not None:
+            return entry[0]
+        payload = await cache_client.get(cache_key)
+        if payload:
+            self._cache_locally(cache_key, cache_ttl, payload)
+        return payload
+    
+    async def _set_cached(self, cache_key: str, cache_ttl: int, payload: bytes):
+        """Store a payload in both the local cache and Redis"""
+        self._cache_locally(cache_key, cache_ttl, payload)
+        await cache_client.setex(cache_key, cache_ttl, payload)
+    
+    def _cache_locally(self, cache_key: str, cache_ttl: int, payload: bytes):
+        """Keep a payload in process memory unless it is too large or not meant to live that long"""
+        ttl = min(LOCAL_CACHE_TTL, cache_ttl)
+        if ttl > 0 and len(payload) <= LOCAL_CACHE_MAX_ITEM_BYTES:
+            _local_cache[cache_key] = (payload, ttl)
+    
+    async def _lookup_result(self, operation: str, n: int, result: str) -> ComputationResult:
+        """Serve a precomputed table entry as a cache hit, still logging the event"""
+        cache_hits_total.labels(operation=operation).inc()
+        await self.repo.save_computation(operation, {"n": n}, result, True)
+        self._publish_completed(operation, {"n": n}, True)
+        return ComputationResult.model_construct(
+            request_id=_uuid7(),
+            result=result,
+            computation_time_ms=0.0,
+            cached=True
+        )
     
-    def _generate_cache_key(self, operation: str, **params) -> str:
-        """Generate deterministic cache key"""
-        key_data = f"{operation}:{json.dumps(params, sort_keys=True)}"
-        return f"math:{hashlib.sha256(key_data.encode()).hexdigest()}"
+    def _run_in_background(self, coro):
+        """Schedule a coroutine without awaiting it"""
+        task = asyncio.create_task(coro)
+        _background_tasks.add(task)
+        task.add_done_callback(_on_background_task_done)
     
-    async def _log_computation(self, operation: str, params: dict, result: str, cached: bool):
-        """Log computation to database and message broker"""
-        await self.repo.save_computation(operation, params, result, cached)
-        await publish_event("computation.completed", {
+    def _publish_completed(self, operation: str, params: dict, cached: bool):
+        """Fire-and-forget publish of the computation.completed event"""
+        self._run_in_background(publish_event("computation.completed", {
             "operation": operation,
             "params": params,
             "cached": cached,
             "timestamp": time.time()
-        })
\ No newline at end of file
+        }))
\ No newline at end of file
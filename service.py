@@ -1,26 +1,105 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, insert
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
+import logging
 
 from ..models.database import ComputationLog
 from ..database import get_session
 
+logger = logging.getLogger(__name__)
+
+LOG_BATCH_SIZE = 500
+LOG_FLUSH_INTERVAL = 0.05  # seconds
+LOG_QUEUE_MAX_SIZE = 10 * LOG_BATCH_SIZE
+
+# Computation log rows waiting to be bulk-inserted by the flusher task; bounded so a
+# slow or unavailable database cannot make rows pile up in memory
+_log_queue: asyncio.Queue = asyncio.Queue(maxsize=LOG_QUEUE_MAX_SIZE)
+_flusher_task: Optional[asyncio.Task] = None
+_dropped_rows = 0
+_STOP = object()
+
+# Core INSERT built once; SQLAlchemy's compiled cache reuses its compiled form per dialect
+_INSERT_LOG = insert(ComputationLog)
+
+async def _flush_rows(rows: List[Dict[str, Any]]):
+    """Bulk-insert a batch of log rows in a single statement and commit"""
+    # get_session is the FastAPI dependency: an async generator yielding one AsyncSession
+    # and closing it afterwards, so it is wrapped to be used outside of request handling
+    async with asynccontextmanager(get_session)() as session:
+        await session.execute(_INSERT_LOG, rows)
+        await session.commit()
+
+async def _log_flusher():
+    """Drain the log queue in batches of up to LOG_BATCH_SIZE rows or LOG_FLUSH_INTERVAL seconds"""
+    global _dropped_rows
+    loop = asyncio.get_running_loop()
+    while True:
+        row = await _log_queue.get()
+        rows = []
+        deadline = loop.time() + LOG_FLUSH_INTERVAL
+        while row is not _STOP:
+            rows.append(row)
+            timeout = deadline - loop.time()
+            if len(rows) >= LOG_BATCH_SIZE or timeout <= 0:
+                row = None
+                break
+            try:
+                row = await asyncio.wait_for(_log_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                row = None
+                break
+        if rows:
+            try:
+                await _flush_rows(rows)
+            except Exception:
+                logger.exception("Failed to persist %d computation log rows", len(rows))
+        if _dropped_rows:
+            logger.warning("Computation log queue full, dropped %d rows", _dropped_rows)
+            _dropped_rows = 0
+        if row is _STOP:
+            return
+
+async def init_log_flusher():
+    """Start the background task that batches computation log inserts"""
+    global _flusher_task
+    _flusher_task = asyncio.create_task(_log_flusher())
+
+async def close_log_flusher():
+    """Stop the flusher once every row queued before shutdown is persisted"""
+    global _flusher_task
+    if _flusher_task is not None:
+        await _log_queue.put(_STOP)
+        await _flusher_task
+        _flusher_task = None
+
 class ComputationRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
     
     async def save_computation(self, operation: str, params: Dict[str, Any], result: str, cached: bool):
-        """Persist computation to database"""
-        log_entry = ComputationLog(
-            operation=operation,
-            parameters=params,
-            result=result[:1000],  # Truncate very large results
-            cached=cached,
-            created_at=datetime.utcnow()
-        )
-        self.session.add(log_entry)
-        await self.session.commit()
+        """Queue computation for batched persistence by the log flusher"""
+        global _dropped_rows
+        row = {
+            "operation": operation,
+            "parameters": params,
+            "result": result[:1000],  # Truncate very large results
+            "cached": cached,
+            "created_at": datetime.utcnow()
+        }
+        if _flusher_task is None:
+            # No flusher running (scripts, tests, after shutdown): insert directly
+            await self.session.execute(_INSERT_LOG, [row])
+            await self.session.commit()
+            return
+        try:
+            _log_queue.put_nowait(row)
+        except asyncio.QueueFull:
+            # Reported in aggregate by the flusher to avoid a warning per dropped row
+            _dropped_rows += 1
     
     async def get_computation_history(self, operation: str = None, limit: int = 100):
         """Retrieve computation history"""